@@ -1,12 +1,17 @@
 # app.py - DYNAMIC ANALYSIS BASED ON ACTUAL IMAGE PROPERTIES
 import streamlit as st
 import numpy as np
-from PIL import Image, ImageFilter, ImageEnhance, ImageDraw
+from PIL import Image, ImageFilter, ImageDraw, ImageStat
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from io import BytesIO
 from datetime import datetime
+from collections import Counter
 import hashlib
+import struct
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 st.set_page_config(
     page_title="Forensic Dental AI System",
@@ -34,86 +39,186 @@ DENTAL_IMAGE_LIBRARY = {
     "Bitewing X-ray": "https://raw.githubusercontent.com/zcytony/DentalXraySegmentation/master/data/raw/3.png",
 }
 
+# Teeth findings are stored as a structured array (one column per field)
+TOOTH_DTYPE = np.dtype([
+    ("number", "U2"),
+    ("name", "U16"),
+    ("type", "U12"),
+    ("condition", "U10"),
+    ("confidence", np.float32),
+])
+
+# Condition groups used for counting and reporting
+TREATED_CONDITIONS = frozenset({"Filled", "Crowned", "Root Canal"})
+ANOMALY_CONDITIONS = frozenset({"Impacted", "Missing", "Carious"})
+DISTINCTIVE_CONDITIONS = frozenset({"Filled", "Crowned", "Root Canal", "Impacted"})
+RARE_CONDITIONS = frozenset({"Impacted", "Root Canal"})
+
+# Base teeth template
+ALL_TEETH = [
+    {"number": "18", "name": "Third Molar", "type": "Wisdom Tooth"},
+    {"number": "17", "name": "Second Molar", "type": "Molar"},
+    {"number": "16", "name": "First Molar", "type": "Molar"},
+    {"number": "15", "name": "Second Premolar", "type": "Premolar"},
+    {"number": "14", "name": "First Premolar", "type": "Premolar"},
+    {"number": "13", "name": "Canine", "type": "Canine"},
+    {"number": "12", "name": "Lateral Incisor", "type": "Incisor"},
+    {"number": "11", "name": "Central Incisor", "type": "Incisor"},
+    {"number": "21", "name": "Central Incisor", "type": "Incisor"},
+    {"number": "22", "name": "Lateral Incisor", "type": "Incisor"},
+    {"number": "23", "name": "Canine", "type": "Canine"},
+    {"number": "24", "name": "First Premolar", "type": "Premolar"},
+    {"number": "25", "name": "Second Premolar", "type": "Premolar"},
+    {"number": "26", "name": "First Molar", "type": "Molar"},
+    {"number": "27", "name": "Second Molar", "type": "Molar"},
+    {"number": "28", "name": "Third Molar", "type": "Wisdom Tooth"},
+]
+
+# Analyze first 8 teeth for demo; conditions are filled in per image
+ANALYZED_TEETH = np.array(
+    [(tooth["number"], tooth["name"], tooth["type"], "", 0.0) for tooth in ALL_TEETH[:8]],
+    dtype=TOOTH_DTYPE
+)
+
+CONDITIONS = np.array(["Healthy", "Filled", "Crowned", "Root Canal", "Impacted", "Missing", "Carious"])
+CONDITION_CUMULATIVE_WEIGHTS = np.cumsum([0.6, 0.15, 0.08, 0.06, 0.05, 0.04, 0.02])
+LOW_CONTRAST_CONDITION_CUMULATIVE_WEIGHTS = np.cumsum([0.4, 0.2, 0.1, 0.1, 0.1, 0.08, 0.02])
+
+@st.cache_resource
 def create_simple_xray():
-    """Create dental X-ray"""
-    img = Image.new('L', (600, 400), color=120)
-    draw = ImageDraw.Draw(img)
-    
-    for i in range(8):
-        x = 150 + i * 50
-        draw.rectangle([x, 150, x+30, 200], fill=200)
-        draw.rectangle([x, 250, x+30, 300], fill=200)
-    
-    return img
+    """Create dental X-ray (shared, callers never modify it in place)"""
+    arr = np.full((400, 600), 120, dtype=np.uint8)
+    
+    # 8 upper and 8 lower teeth, 31x51 px each, every 50 px from x=150
+    cols = np.arange(600)
+    tooth_cols = (cols >= 150) & (cols <= 530) & ((cols - 150) % 50 <= 30)
+    rows = np.arange(400)
+    tooth_rows = ((rows >= 150) & (rows <= 200)) | ((rows >= 250) & (rows <= 300))
+    arr[np.ix_(tooth_rows, tooth_cols)] = 200
+    
+    return Image.fromarray(arr)
+
+def to_grayscale(image):
+    """Convert to 8-bit grayscale, without a copy when the image already is"""
+    if image.mode == 'L':
+        image.load()
+        return image
+    return image.convert('L')
+
+@st.cache_resource
+def get_http_session():
+    """Shared HTTP session so library downloads reuse pooled connections"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return session
+
+@st.cache_data(ttl=86400, max_entries=16, show_spinner=False)
+def fetch_library_image(url):
+    """Download and decode a library image (failures are not cached)"""
+    response = get_http_session().get(url, timeout=10)
+    response.raise_for_status()
+    img = Image.open(BytesIO(response.content))
+    return to_grayscale(img)
+
+def prefetch_library_images():
+    """Warm the image cache for the whole library in the background"""
+    executor = ThreadPoolExecutor(max_workers=len(DENTAL_IMAGE_LIBRARY))
+    for url in DENTAL_IMAGE_LIBRARY.values():
+        executor.submit(fetch_library_image, url)
+    executor.shutdown(wait=False)
 
 def load_dental_image(image_name):
     """Load dental image"""
     try:
         if image_name in DENTAL_IMAGE_LIBRARY:
-            response = requests.get(DENTAL_IMAGE_LIBRARY[image_name], timeout=10)
-            img = Image.open(BytesIO(response.content))
-            return img.convert('L')
+            return fetch_library_image(DENTAL_IMAGE_LIBRARY[image_name])
     except:
         pass
     return create_simple_xray()
 
-def apply_degradation(image, degradation_type, severity=0.5):
-    """Apply degradation"""
-    img = image.copy()
-    
-    if degradation_type == "Thermal Damage":
-        arr = np.array(img).astype(float)
-        noise = np.random.normal(0, 50 * severity, arr.shape)
-        arr = np.clip(arr + noise, 0, 255)
-        img = Image.fromarray(arr.astype(np.uint8))
+def adjust_contrast(image, factor):
+    """Same result as ImageEnhance.Contrast, as a single lookup-table pass"""
+    mean = np.float32(int(ImageStat.Stat(image).mean[0] + 0.5))
+    levels = np.arange(256, dtype=np.float32)
+    lut = np.clip(mean + np.float32(factor) * (levels - mean), 0, 255).astype(np.uint8)
+    return image.point(lut.tolist())
+
+def apply_thermal_damage(image, severity):
+    """Add heat noise, then blur at high severity"""
+    # Accumulate into the noise buffer so the pixels are never copied to a wider type
+    noise = np.random.default_rng().standard_normal((image.height, image.width), dtype=np.float32)
+    noise *= 50 * severity
+    noise += np.asarray(image)
+    # Clip and narrow to uint8 in the same pass
+    arr = np.empty(noise.shape, dtype=np.uint8)
+    np.clip(noise, 0, 255, out=arr, casting='unsafe')
+    img = Image.fromarray(arr)
+    if int(severity) > 0:
         img = img.filter(ImageFilter.GaussianBlur(radius=int(severity)))
-        
-    elif degradation_type == "Water Damage":
+    return img
+
+def apply_water_damage(image, severity):
+    """Blur and wash out contrast"""
+    img = image
+    if int(2 * severity) > 0:
         img = img.filter(ImageFilter.GaussianBlur(radius=int(2 * severity)))
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(0.6)
-        
-    elif degradation_type == "Trauma Damage":
-        arr = np.array(img)
-        h, w = arr.shape
-        for _ in range(int(3 * severity)):
-            patch_size = int(20 * severity)
-            x = np.random.randint(0, w - patch_size)
-            y = np.random.randint(0, h - patch_size)
-            arr[y:y+patch_size, x:x+patch_size] = 0
-        img = Image.fromarray(arr)
-        
+    return adjust_contrast(img, 0.6)
+
+def apply_trauma_damage(image, severity):
+    """Black out random square patches"""
+    img = image.copy()
+    num_patches = int(3 * severity)
+    if num_patches == 0:
+        return img
+    w, h = img.size
+    rng = np.random.default_rng()
+    patch_size = int(20 * severity)
+    xs = rng.integers(0, w - patch_size, num_patches)
+    ys = rng.integers(0, h - patch_size, num_patches)
+    # Black out the patches in place, no NumPy round-trip
+    draw = ImageDraw.Draw(img)
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        draw.rectangle([x, y, x+patch_size-1, y+patch_size-1], fill=0)
     return img
 
+# Degradation dispatch table (also the list offered in the UI)
+DEGRADATION_TYPES = {
+    "Thermal Damage": apply_thermal_damage,
+    "Water Damage": apply_water_damage,
+    "Trauma Damage": apply_trauma_damage,
+}
+
+def apply_degradation(image, degradation_type, severity=0.5):
+    """Apply degradation"""
+    degrade = DEGRADATION_TYPES.get(degradation_type)
+    if degrade is None:
+        return image.copy()
+    # Each degradation builds a new image, so the input is never modified
+    return degrade(image, severity)
+
+# Sharpness(2.0) folded into one kernel: 2 * identity - SMOOTH
+SHARPEN_KERNEL = ImageFilter.Kernel((3, 3), [-1, -1, -1, -1, 21, -1, -1, -1, -1], scale=13)
+
 def enhance_image(image):
     """Enhance image"""
-    img = image.copy()
-    
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(2.0)
-    
-    enhancer = ImageEnhance.Sharpness(img)
-    img = enhancer.enhance(2.0)
+    img = adjust_contrast(image, 2.0)
     
-    return img
+    return img.filter(SHARPEN_KERNEL)
 
-def generate_image_fingerprint(image):
-    """Generate unique fingerprint for each image"""
-    img_array = np.array(image)
-    # Use image properties to create unique hash
-    fingerprint = hashlib.md5(
-        f"{img_array.shape}{img_array.mean():.2f}{img_array.std():.2f}".encode()
-    ).hexdigest()[:8]
+def fingerprint_from_stats(shape, mean, std):
+    """Generate fingerprint from precomputed image shape, mean and std"""
+    # Use image properties (stats to 2 decimals) to create unique hash
+    fingerprint = hashlib.blake2s(
+        struct.pack("<4q", shape[0], shape[1], round(float(mean) * 100), round(float(std) * 100)),
+        digest_size=4
+    ).hexdigest()
     return fingerprint
 
 def analyze_image_quality(image):
     """Analyze actual image quality metrics"""
-    img_array = np.array(image)
-    
     # Calculate actual image statistics
-    mean_intensity = img_array.mean()
-    contrast = img_array.std()
-    entropy = calculate_entropy(img_array)
+    mean_intensity, contrast, histogram = calculate_pil_image_stats(image)
+    entropy = entropy_from_histogram(histogram)
     
     # Normalize to 0-100 scale
     clarity = min(100, (contrast / 128) * 100)
@@ -125,95 +230,93 @@ def analyze_image_quality(image):
         "sharpness": round(sharpness, 1),
         "brightness_balance": round(brightness_balance, 1),
         "contrast_level": round(contrast, 1),
-        "mean_intensity": round(mean_intensity, 1)
+        "mean_intensity": round(mean_intensity, 1),
+        # Unrounded std, so thresholds on it match the raw pixel statistics
+        "std": float(contrast),
+        "fingerprint": fingerprint_from_stats((image.height, image.width), mean_intensity, contrast)
     }
 
-def calculate_entropy(img_array):
-    """Calculate image entropy (complexity)"""
-    histogram = np.histogram(img_array, bins=256, range=(0, 255))[0]
+def stats_from_histogram(histogram):
+    """Calculate mean and std from a 256-bin intensity histogram"""
+    levels = np.arange(256)
+    count = histogram.sum()
+    mean = (histogram @ levels) / count
+    variance = (histogram @ (levels * levels)) / count - mean ** 2
+    return mean, np.sqrt(max(variance, 0.0))
+
+def calculate_pil_image_stats(image):
+    """Calculate mean, std and histogram from Pillow's native histogram of an 'L' image"""
+    histogram = np.array(image.histogram())
+    return (*stats_from_histogram(histogram), histogram)
+
+def entropy_from_histogram(histogram):
+    """Calculate entropy from a 256-bin intensity histogram"""
+    # H = log2(N) - sum(h * log2(h)) / N, so no probability array is needed
     histogram = histogram[histogram > 0]
-    prob = histogram / histogram.sum()
-    return -np.sum(prob * np.log2(prob))
+    total = histogram.sum()
+    return np.log2(total) - np.dot(histogram, np.log2(histogram)) / total
 
-def detect_teeth_based_on_image(image):
+def detect_teeth_based_on_image(image, quality=None):
     """Generate unique teeth analysis based on image properties"""
-    img_array = np.array(image)
-    fingerprint = generate_image_fingerprint(image)
-    
+    # Reuse the quality stats (and fingerprint) when the caller already has them
+    if quality is None:
+        quality = analyze_image_quality(image)
+    return detect_teeth_from_fingerprint(quality["fingerprint"], quality["std"])
+
+@st.cache_data(show_spinner=False)
+def detect_teeth_from_fingerprint(fingerprint, std_val):
+    """Generate teeth analysis from the image fingerprint and contrast (std)"""
     # Use fingerprint to seed random but consistent results
     seed = int(fingerprint, 16) % 10000
-    np.random.seed(seed)
-    
-    # Base teeth template
-    all_teeth = [
-        {"number": "18", "name": "Third Molar", "type": "Wisdom Tooth"},
-        {"number": "17", "name": "Second Molar", "type": "Molar"},
-        {"number": "16", "name": "First Molar", "type": "Molar"},
-        {"number": "15", "name": "Second Premolar", "type": "Premolar"},
-        {"number": "14", "name": "First Premolar", "type": "Premolar"},
-        {"number": "13", "name": "Canine", "type": "Canine"},
-        {"number": "12", "name": "Lateral Incisor", "type": "Incisor"},
-        {"number": "11", "name": "Central Incisor", "type": "Incisor"},
-        {"number": "21", "name": "Central Incisor", "type": "Incisor"},
-        {"number": "22", "name": "Lateral Incisor", "type": "Incisor"},
-        {"number": "23", "name": "Canine", "type": "Canine"},
-        {"number": "24", "name": "First Premolar", "type": "Premolar"},
-        {"number": "25", "name": "Second Premolar", "type": "Premolar"},
-        {"number": "26", "name": "First Molar", "type": "Molar"},
-        {"number": "27", "name": "Second Molar", "type": "Molar"},
-        {"number": "28", "name": "Third Molar", "type": "Wisdom Tooth"},
-    ]
-    
-    # Analyze image to determine conditions
-    mean_val = img_array.mean()
-    std_val = img_array.std()
-    
-    teeth_data = []
-    conditions = ["Healthy", "Filled", "Crowned", "Root Canal", "Impacted", "Missing", "Carious"]
-    condition_weights = [0.6, 0.15, 0.08, 0.06, 0.05, 0.04, 0.02]
+    rng = np.random.default_rng(seed)
+    
+    cumulative_weights = CONDITION_CUMULATIVE_WEIGHTS
     
     # Adjust weights based on image characteristics
     if std_val < 30:  # Low contrast images might have more issues
-        condition_weights = [0.4, 0.2, 0.1, 0.1, 0.1, 0.08, 0.02]
+        cumulative_weights = LOW_CONTRAST_CONDITION_CUMULATIVE_WEIGHTS
     
-    for tooth in all_teeth[:8]:  # Analyze first 8 teeth for demo
-        # Generate consistent but unique condition for each tooth
-        tooth_seed = seed + int(tooth["number"])
-        np.random.seed(tooth_seed)
-        
-        condition = np.random.choice(conditions, p=condition_weights)
-        confidence = np.random.uniform(0.75, 0.98)
-        
-        # Adjust confidence based on image quality
-        if std_val < 25:
-            confidence *= 0.8
-        elif std_val > 80:
-            confidence *= 1.1
-            
-        teeth_data.append({
-            "number": tooth["number"],
-            "name": tooth["name"],
-            "type": tooth["type"],
-            "condition": condition,
-            "confidence": round(confidence, 3)
-        })
+    num_teeth = len(ANALYZED_TEETH)
+    
+    # Draw every tooth's condition and confidence in one batch from the seeded generator
+    condition_idx = np.searchsorted(cumulative_weights, rng.random(num_teeth), side="right")
+    confidences = rng.uniform(0.75, 0.98, num_teeth)
+    
+    # Adjust confidence based on image quality
+    if std_val < 25:
+        confidences *= 0.8
+    elif std_val > 80:
+        confidences *= 1.1
+    
+    teeth_data = ANALYZED_TEETH.copy()
+    teeth_data["condition"] = CONDITIONS[np.minimum(condition_idx, len(CONDITIONS) - 1)]
+    teeth_data["confidence"] = np.round(confidences, 3)
     
     return teeth_data
 
-def calculate_forensic_metrics_based_on_image(original_img, enhanced_img, teeth_data):
+def count_condition_groups(teeth_data):
+    """Count healthy, treated and anomalous teeth in a single pass"""
+    counts = Counter(teeth_data["condition"].tolist())
+    return (
+        counts["Healthy"],
+        sum(counts[condition] for condition in TREATED_CONDITIONS),
+        sum(counts[condition] for condition in ANOMALY_CONDITIONS),
+    )
+
+def calculate_forensic_metrics_based_on_image(original_img, enhanced_img, teeth_data, enhanced_quality=None):
     """Calculate dynamic forensic metrics based on actual image analysis"""
     # Analyze original image quality
     orig_quality = analyze_image_quality(original_img)
-    enhanced_quality = analyze_image_quality(enhanced_img)
+    # Reuse the enhanced image's quality when the caller already has it
+    if enhanced_quality is None:
+        enhanced_quality = analyze_image_quality(enhanced_img)
     
     # Calculate improvement
     clarity_improvement = enhanced_quality["clarity"] - orig_quality["clarity"]
     sharpness_improvement = enhanced_quality["sharpness"] - orig_quality["sharpness"]
     
     # Analyze teeth findings
-    healthy_count = len([t for t in teeth_data if t["condition"] == "Healthy"])
-    treated_count = len([t for t in teeth_data if t["condition"] in ["Filled", "Crowned", "Root Canal"]])
-    issue_count = len([t for t in teeth_data if t["condition"] in ["Impacted", "Missing", "Carious"]])
+    healthy_count, treated_count, issue_count = count_condition_groups(teeth_data)
     
     # Calculate forensic utility score
     base_utility = enhanced_quality["clarity"] * 0.4 + enhanced_quality["sharpness"] * 0.3
@@ -232,11 +335,36 @@ def calculate_forensic_metrics_based_on_image(original_img, enhanced_img, teeth_
         "forensic_utility": round(forensic_utility, 1),
         "identification_confidence": round(id_confidence, 1),
         "distinctive_features": distinctive_features,
-        "dental_health_score": round((healthy_count / len(teeth_data)) * 100, 1)
+        "dental_health_score": round((healthy_count / len(teeth_data)) * 100, 1),
+        "healthy_teeth": healthy_count,
+        "treated_teeth": treated_count,
+        "anomalous_teeth": issue_count,
+        "original_fingerprint": orig_quality["fingerprint"],
+        "enhanced_fingerprint": enhanced_quality["fingerprint"]
     }
 
-def create_dynamic_tooth_chart(teeth_data, image_fingerprint):
-    """Create unique tooth chart based on analysis"""
+# Tooth positions
+TOOTH_CHART_POSITIONS = {
+    "18": (220, 100), "17": (280, 90), "16": (340, 85), "15": (400, 90),
+    "14": (460, 100), "13": (520, 120), "12": (560, 150), "11": (580, 180),
+    "28": (220, 300), "27": (280, 290), "26": (340, 285), "25": (400, 290),
+    "24": (460, 300), "23": (520, 270), "22": (560, 250), "21": (580, 220)
+}
+
+# Condition colors
+CONDITION_COLORS = {
+    "Healthy": "#4CAF50",      # Green
+    "Filled": "#2196F3",       # Blue
+    "Crowned": "#FF9800",      # Orange
+    "Root Canal": "#9C27B0",   # Purple
+    "Impacted": "#F44336",     # Red
+    "Missing": "#9E9E9E",      # Gray
+    "Carious": "#795548"       # Brown
+}
+
+@st.cache_resource
+def create_tooth_chart_template():
+    """Draw the static parts of the tooth chart (shared, callers copy before drawing)"""
     img = Image.new('RGB', (800, 400), color=0xFFFFFF)
     draw = ImageDraw.Draw(img)
     
@@ -244,29 +372,24 @@ def create_dynamic_tooth_chart(teeth_data, image_fingerprint):
     draw.ellipse([200, 50, 600, 200], outline='black', width=2)  # Upper jaw
     draw.ellipse([200, 200, 600, 350], outline='black', width=2)  # Lower jaw
     
-    # Tooth positions
-    positions = {
-        "18": (220, 100), "17": (280, 90), "16": (340, 85), "15": (400, 90),
-        "14": (460, 100), "13": (520, 120), "12": (560, 150), "11": (580, 180),
-        "28": (220, 300), "27": (280, 290), "26": (340, 285), "25": (400, 290),
-        "24": (460, 300), "23": (520, 270), "22": (560, 250), "21": (580, 220)
-    }
+    # Add legend
+    legend_y = 360
+    for i, (condition, color) in enumerate(list(CONDITION_COLORS.items())[:4]):
+        x_pos = 50 + i * 180
+        draw.rectangle([x_pos, legend_y, x_pos+10, legend_y+10], fill=color)
+        draw.text((x_pos+15, legend_y-2), condition, fill='black')
     
-    # Condition colors
-    condition_colors = {
-        "Healthy": "#4CAF50",      # Green
-        "Filled": "#2196F3",       # Blue
-        "Crowned": "#FF9800",      # Orange
-        "Root Canal": "#9C27B0",   # Purple
-        "Impacted": "#F44336",     # Red
-        "Missing": "#9E9E9E",      # Gray
-        "Carious": "#795548"       # Brown
-    }
+    return img
+
+def create_dynamic_tooth_chart(teeth_data, image_fingerprint):
+    """Create unique tooth chart based on analysis"""
+    img = create_tooth_chart_template().copy()
+    draw = ImageDraw.Draw(img)
     
     for tooth in teeth_data:
-        if tooth["number"] in positions:
-            x, y = positions[tooth["number"]]
-            color = condition_colors.get(tooth["condition"], "#000000")
+        if tooth["number"] in TOOTH_CHART_POSITIONS:
+            x, y = TOOTH_CHART_POSITIONS[tooth["number"]]
+            color = CONDITION_COLORS.get(tooth["condition"], "#000000")
             
             # Draw tooth
             draw.ellipse([x-15, y-15, x+15, y+15], fill=color, outline='black', width=2)
@@ -274,25 +397,19 @@ def create_dynamic_tooth_chart(teeth_data, image_fingerprint):
             # Draw tooth number
             draw.text((x-5, y-5), tooth["number"], fill='white')
     
-    # Add legend
-    legend_y = 360
-    for i, (condition, color) in enumerate(list(condition_colors.items())[:4]):
-        x_pos = 50 + i * 180
-        draw.rectangle([x_pos, legend_y, x_pos+10, legend_y+10], fill=color)
-        draw.text((x_pos+15, legend_y-2), condition, fill='black')
-    
     return img
 
-def generate_unique_report(case_data, metrics, teeth_data, original_img, enhanced_img):
+def generate_unique_report(case_data, metrics, teeth_data):
     """Generate unique report based on actual image analysis"""
     
-    # Get image fingerprints
-    orig_fingerprint = generate_image_fingerprint(original_img)
-    enhanced_fingerprint = generate_image_fingerprint(enhanced_img)
+    # Image fingerprints were recorded with the metrics
+    orig_fingerprint = metrics["original_fingerprint"]
+    enhanced_fingerprint = metrics["enhanced_fingerprint"]
     
     # Analyze distinctive features
-    distinctive_teeth = [t for t in teeth_data if t["condition"] in ["Filled", "Crowned", "Root Canal", "Impacted"]]
-    rare_conditions = [t for t in teeth_data if t["condition"] in ["Impacted", "Root Canal"]]
+    conditions = teeth_data["condition"]
+    distinctive_teeth = teeth_data[np.isin(conditions, list(DISTINCTIVE_CONDITIONS))]
+    rare_conditions = teeth_data[np.isin(conditions, list(RARE_CONDITIONS))]
     
     # Determine report conclusion based on analysis
     if metrics["identification_confidence"] >= 90:
@@ -305,7 +422,7 @@ def generate_unique_report(case_data, metrics, teeth_data, original_img, enhance
         conclusion = "**MODERATE** - Limited identification value"
         recommendation = "Suggest supplementary evidence collection"
     
-    report = f"""
+    parts = [f"""
 # FORENSIC DENTAL ANALYSIS REPORT
 
 ## Case Information
@@ -332,27 +449,31 @@ def generate_unique_report(case_data, metrics, teeth_data, original_img, enhance
 
 ### Summary Statistics
 - **Total Teeth Analyzed**: {len(teeth_data)}
-- **Healthy Teeth**: {len([t for t in teeth_data if t['condition'] == 'Healthy'])}
-- **Restored Teeth**: {len([t for t in teeth_data if t['condition'] in ['Filled', 'Crowned', 'Root Canal']])}
-- **Dental Anomalies**: {len([t for t in teeth_data if t['condition'] in ['Impacted', 'Missing', 'Carious']])}
+- **Healthy Teeth**: {metrics['healthy_teeth']}
+- **Restored Teeth**: {metrics['treated_teeth']}
+- **Dental Anomalies**: {metrics['anomalous_teeth']}
 
 ### Key Identifying Features
-"""
+"""]
     
     # Add unique dental features
-    if distinctive_teeth:
-        report += "\n**Primary Identifying Characteristics:**\n"
-        for tooth in distinctive_teeth[:3]:  # Show top 3 most distinctive
-            report += f"- **Tooth {tooth['number']}** ({tooth['name']}): {tooth['condition']} - {tooth['confidence']*100:.1f}% confidence\n"
+    if len(distinctive_teeth):
+        parts.append("\n**Primary Identifying Characteristics:**\n")
+        parts.extend(  # Show top 3 most distinctive
+            f"- **Tooth {tooth['number']}** ({tooth['name']}): {tooth['condition']} - {tooth['confidence']*100:.1f}% confidence\n"
+            for tooth in distinctive_teeth[:3]
+        )
     else:
-        report += "\n**Note**: Limited distinctive dental work identified\n"
+        parts.append("\n**Note**: Limited distinctive dental work identified\n")
     
-    if rare_conditions:
-        report += "\n**Rare Dental Conditions Detected:**\n"
-        for tooth in rare_conditions:
-            report += f"- Tooth {tooth['number']}: {tooth['condition']} (uncommon finding)\n"
+    if len(rare_conditions):
+        parts.append("\n**Rare Dental Conditions Detected:**\n")
+        parts.extend(
+            f"- Tooth {tooth['number']}: {tooth['condition']} (uncommon finding)\n"
+            for tooth in rare_conditions
+        )
     
-    report += f"""
+    parts.append(f"""
 ## Professional Assessment
 
 ### Conclusion
@@ -361,16 +482,33 @@ def generate_unique_report(case_data, metrics, teeth_data, original_img, enhance
 ### Recommendations
 1. {recommendation}
 2. Distinctive features provide {'strong' if metrics['distinctive_features'] >= 3 else 'moderate'} identifying markers
-3. {'Multiple rare conditions enhance identification value' if rare_conditions else 'Standard dental pattern observed'}
+3. {'Multiple rare conditions enhance identification value' if len(rare_conditions) else 'Standard dental pattern observed'}
 
 ### Legal Admissibility
 **Rating**: {'High' if metrics['identification_confidence'] > 80 else 'Moderate'}
 
 ---
 *Report generated by Forensic Dental AI System | Image-Specific Analysis | {datetime.now().strftime("%Y-%m-%d %H:%M")}*
-"""
+""")
     
-    return report
+    return "".join(parts)
+
+def analyze_evidence_image(image):
+    """Enhance and analyze one evidence image"""
+    enhanced_img = enhance_image(image)
+    enhanced_quality = analyze_image_quality(enhanced_img)
+    teeth_data = detect_teeth_based_on_image(enhanced_img, quality=enhanced_quality)
+    metrics = calculate_forensic_metrics_based_on_image(image, enhanced_img, teeth_data, enhanced_quality)
+    return metrics
+
+def analyze_evidence_batch(images):
+    """Analyze several evidence images in parallel (NumPy and Pillow release the GIL)"""
+    if not images:
+        # min() below would give max_workers=0, which ThreadPoolExecutor rejects
+        return []
+    # One worker per image, capped at the core count to avoid oversubscription
+    with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1)) as pool:
+        return list(pool.map(analyze_evidence_image, images))
 
 # Initialize session state
 if 'app_initialized' not in st.session_state:
@@ -385,6 +523,7 @@ if 'app_initialized' not in st.session_state:
     st.session_state.metrics = None
     st.session_state.teeth_data = None
     st.session_state.image_fingerprint = None
+    prefetch_library_images()
 
 # Main app
 st.markdown('<h1 class="main-header">🦷 Forensic Dental AI System</h1>', unsafe_allow_html=True)
@@ -419,7 +558,7 @@ with tab1:
         uploaded_file = st.file_uploader("Upload dental image", type=['jpg', 'jpeg', 'png'], key="file_uploader")
         if uploaded_file is not None:
             try:
-                img = Image.open(uploaded_file).convert('L')
+                img = to_grayscale(Image.open(uploaded_file))
                 st.session_state.current_image = img
                 st.session_state.current_name = uploaded_file.name
                 
@@ -443,7 +582,7 @@ with tab1:
         st.markdown("### Apply Degradation")
         
         deg_type = st.selectbox("Degradation Type:", 
-                               ["Thermal Damage", "Water Damage", "Trauma Damage"],
+                               list(DEGRADATION_TYPES),
                                key="deg_type")
         severity = st.slider("Severity Level:", 1, 10, 5, key="severity_slider")
         
@@ -462,6 +601,29 @@ with tab1:
             st.image(st.session_state.degraded, caption="Degraded Image")
         else:
             st.info("👆 Apply degradation to continue")
+    
+    with st.expander("📂 Batch Evidence Analysis"):
+        batch_files = st.file_uploader("Upload several dental images", type=['jpg', 'jpeg', 'png'],
+                                       accept_multiple_files=True, key="batch_uploader")
+        if batch_files and st.button("Analyze Batch", key="analyze_batch"):
+            try:
+                with st.spinner(f"Analyzing {len(batch_files)} images..."):
+                    images = [to_grayscale(Image.open(f)) for f in batch_files]
+                    results = analyze_evidence_batch(images)
+                
+                st.dataframe([
+                    {
+                        "File": f.name,
+                        "Fingerprint": metrics["enhanced_fingerprint"],
+                        "ID Confidence (%)": metrics["identification_confidence"],
+                        "Forensic Utility (%)": metrics["forensic_utility"],
+                        "Clarity (%)": metrics["image_clarity"],
+                        "Distinctive Features": metrics["distinctive_features"],
+                    }
+                    for f, metrics in zip(batch_files, results)
+                ])
+            except Exception as e:
+                st.error(f"Batch analysis error: {e}")
 
 with tab2:
     st.markdown("### Step 2: AI Enhancement")
@@ -488,11 +650,15 @@ with tab2:
                         
                     with st.spinner("Generating unique analysis... This may take a few moments..."):
                         # Generate unique analysis based on actual image
-                        st.session_state.image_fingerprint = generate_image_fingerprint(enhanced_img)
-                        st.session_state.teeth_data = detect_teeth_based_on_image(enhanced_img)
+                        enhanced_quality = analyze_image_quality(enhanced_img)
+                        st.session_state.teeth_data = detect_teeth_based_on_image(
+                            enhanced_img, quality=enhanced_quality
+                        )
                         st.session_state.metrics = calculate_forensic_metrics_based_on_image(
-                            st.session_state.degraded, enhanced_img, st.session_state.teeth_data
+                            st.session_state.degraded, enhanced_img, st.session_state.teeth_data,
+                            enhanced_quality
                         )
+                        st.session_state.image_fingerprint = st.session_state.metrics["enhanced_fingerprint"]
                         
                         st.session_state.analysis_done = True
                         st.success("✅ Enhancement & Analysis completed!")
@@ -550,9 +716,9 @@ with tab3:
             st.markdown("#### 📋 Image-Specific Findings")
             
             # Summary based on actual analysis
-            if st.session_state.teeth_data:
-                healthy_count = len([t for t in st.session_state.teeth_data if t["condition"] == "Healthy"])
-                treated_count = len([t for t in st.session_state.teeth_data if t["condition"] in ["Filled", "Crowned", "Root Canal"]])
+            if st.session_state.metrics:
+                healthy_count = st.session_state.metrics["healthy_teeth"]
+                treated_count = st.session_state.metrics["treated_teeth"]
             else:
                 healthy_count = 0
                 treated_count = 0
@@ -564,7 +730,7 @@ with tab3:
                 st.metric("Treated Teeth", treated_count)
             
             st.markdown("#### Detailed Tooth Analysis")
-            if st.session_state.teeth_data:
+            if st.session_state.teeth_data is not None:
                 for tooth in st.session_state.teeth_data:
                     with st.expander(f"Tooth {tooth['number']} - {tooth['name']} ({tooth['type']})"):
                         st.write(f"**Condition:** {tooth['condition']}")
@@ -592,9 +758,7 @@ with tab4:
         report = generate_unique_report(
             case_data, 
             st.session_state.metrics, 
-            st.session_state.teeth_data,
-            st.session_state.degraded,
-            st.session_state.enhanced
+            st.session_state.teeth_data
         )
         
         st.markdown(report)